@@ -69,10 +69,16 @@ class CycloneDXVersion1(SBOMHandler):
                 continue
 
             purl = cdx_component.get("purl")
-            if purl is None or get_purl_digest(purl) != image.digest:
+            if purl is None:
                 continue
 
-            self._update_container_component(component, cdx_component, update_tags=True)
+            digest = get_purl_digest(purl)
+            if digest != image.digest:
+                continue
+
+            self._update_container_component(
+                component, cdx_component, update_tags=True, digest=digest
+            )
 
     def _bump_version(self, sbom: dict) -> None:
         """
@@ -119,8 +125,16 @@ class CycloneDXVersion1(SBOMHandler):
             evidence["identity"] = [identity, *new_identity]
 
     def _update_container_component(
-        self, kflx_component: Component, cdx_component: dict, update_tags: bool
+        self,
+        kflx_component: Component,
+        cdx_component: dict,
+        update_tags: bool,
+        digest: Optional[str] = None,
     ) -> None:
+        """
+        Callers that already know the digest of the component purl can pass it
+        via <digest> to avoid parsing the purl a second time.
+        """
         if (comp_type := cdx_component.get("type")) != "container":
             logger.warning(
                 'Called update method on CDX package with type %s instead of "container".',
@@ -133,7 +147,8 @@ class CycloneDXVersion1(SBOMHandler):
             return
 
         arch = get_purl_arch(purl)
-        digest = get_purl_digest(purl)
+        if digest is None:
+            digest = get_purl_digest(purl)
         tag = kflx_component.tags[0] if kflx_component.tags else None
         new_purl = construct_purl(kflx_component.repository, digest, arch=arch, tag=tag)
         cdx_component["purl"] = new_purl
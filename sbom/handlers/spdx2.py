@@ -2,6 +2,7 @@
 This module contains the SBOM handler for SPDX version 2 SBOMs.
 """
 
+import functools
 from enum import Enum
 from typing import Optional, Union, Any
 
@@ -15,20 +16,25 @@ from sbom.sbomlib import (
     SBOMError,
     SBOMHandler,
     construct_purl,
-    get_purl_arch,
-    get_purl_digest,
     make_reference,
     without_sha_header,
 )
 
 logger = get_sbom_logger()
 
+# Purl parsing is a non-trivial regex-heavy operation and the same locator
+# strings recur across packages of an SBOM, so memoize the parse.
+_parse_purl = functools.lru_cache(maxsize=4096)(PackageURL.from_string)
+
 
 class SPDXPackage:
     """
     Wrapper class for easier SPDX package manipulation.
     """
 
+    _REF_CATEGORY = "PACKAGE-MANAGER"
+    _REF_TYPE = "purl"
+
     def __init__(self, package: Any) -> None:
         self.package = package
 
@@ -60,15 +66,14 @@ class SPDXPackage:
         Extracts a sha256 checksum from an SPDX package. Returns None if no such
         checksum is found.
         """
-        checksums = self.checksums
-        if checksums is None:
-            return None
-
-        for checksum in checksums:
-            if checksum.get("algorithm") == "SHA256":
-                return checksum.get("checksumValue")
-
-        return None
+        return next(
+            (
+                checksum.get("checksumValue")
+                for checksum in self.checksums or ()
+                if checksum.get("algorithm") == "SHA256"
+            ),
+            None,
+        )
 
     def update_external_refs(
         self,
@@ -105,8 +110,10 @@ class SPDXPackage:
             if purl_str is None:
                 return False
 
-            purl = PackageURL.from_string(purl_str)
-            return purl.type == "oci"
+            # The purl type is always the first path segment of the locator,
+            # so a prefix check is enough and avoids a full PackageURL parse
+            # per ref.
+            return purl_str[:8].lower() == "pkg:oci/"
 
         new_external_refs = [ref for ref in self.external_refs if not is_oci_purl_ref(ref)]
         self.external_refs = new_external_refs
@@ -118,19 +125,14 @@ class SPDXPackage:
         """
         Gets new oci purl externalRefs value based on input information.
         """
-        purls = (construct_purl(repository, digest, tag=tag, arch=arch) for tag in tags)
-        return [SPDXPackage._make_purl_ref(purl) for purl in purls]
-
-    @staticmethod
-    def _make_purl_ref(purl: str) -> dict[str, str]:
-        """
-        Create an SPDX externalRefs field from a PackageURL.
-        """
-        return {
-            "referenceCategory": "PACKAGE-MANAGER",
-            "referenceType": "purl",
-            "referenceLocator": purl,
-        }
+        return [
+            {
+                "referenceCategory": SPDXPackage._REF_CATEGORY,
+                "referenceType": SPDXPackage._REF_TYPE,
+                "referenceLocator": construct_purl(repository, digest, tag=tag, arch=arch),
+            }
+            for tag in tags
+        ]
 
 
 class SPDXSpec(Enum):
@@ -175,28 +177,46 @@ class SPDXVersion2(SBOMHandler):  # pylint: disable=too-few-public-methods
         return spec in cls.supported_versions
 
     @classmethod
-    def _find_purl_in_refs(cls, package: SPDXPackage, digest: str) -> Optional[str]:
+    def _find_purl_and_arch_in_refs(
+        cls, package: SPDXPackage, digest: str
+    ) -> Optional[tuple[str, Optional[str]]]:
         """
         Tries to find a purl in the externalRefs of a package the version of
-        which matches the passed digest.
+        which matches the passed digest. Returns the purl together with its
+        arch qualifier, so each purl is parsed only once.
         """
-        for ref in filter(lambda rf: rf["referenceType"] == "purl", package.external_refs):
-            purl = ref["referenceLocator"]
-            if digest == get_purl_digest(purl):
-                return purl
+        for ref in package.external_refs:
+            if ref["referenceType"] != "purl":
+                continue
+
+            locator = ref["referenceLocator"]
+            purl = _parse_purl(locator)
+            if purl.version != digest:
+                continue
+
+            arch = None
+            if isinstance(purl.qualifiers, dict):
+                arch = purl.qualifiers.get("arch")
+
+            return locator, arch
 
         return None
 
     @classmethod
-    def _find_image_package(cls, sbom: dict, digest: str) -> Optional[SPDXPackage]:
+    def _build_checksum_index(cls, sbom: dict) -> dict[str, SPDXPackage]:
         """
-        Find the SPDX package for a digest, based on the package checksum.
+        Build a mapping of SHA256 checksums (without the sha256: header) to
+        SPDX packages in a single pass over the SBOM. Packages without a
+        SHA256 checksum are skipped; the first package wins on duplicate
+        checksums.
         """
+        index: dict[str, SPDXPackage] = {}
         for package in map(SPDXPackage, sbom.get("packages", [])):
-            if without_sha_header(digest) == package.sha256_checksum:
-                return package
+            value = package.sha256_checksum
+            if value is not None:
+                index.setdefault(value, package)
 
-        return None
+        return index
 
     @classmethod
     def _update_index_image_sbom(
@@ -207,24 +227,43 @@ class SPDXVersion2(SBOMHandler):  # pylint: disable=too-few-public-methods
         """
         sbom["name"] = make_reference(component.release_repository, index.digest)
 
-        index_package = cls._find_image_package(sbom, index.digest)
+        if not component.tags:
+            logger.warning(
+                "Component %s has no tags, skipping purl updates for index %s.",
+                component.name,
+                index.digest,
+            )
+            return
+
+        checksum_index = cls._build_checksum_index(sbom)
+
+        # Constant across the children loop below; hoist the attribute loads.
+        release_repository = component.release_repository
+        tags = component.tags
+
+        index_package = checksum_index.get(without_sha_header(index.digest))
         if not index_package:
             raise SBOMError(f"Could not find SPDX package for index {index}")
 
         index_package.update_external_refs(
             index.digest,
-            component.release_repository,
-            component.tags,
+            release_repository,
+            tags,
         )
 
+        child_checksums = {without_sha_header(image.digest) for image in index.children}
+        if index.children and checksum_index.keys().isdisjoint(child_checksums):
+            logger.warning("No SPDX packages match any child of index %s.", index.digest)
+            return
+
         for image in index.children:
-            package = cls._find_image_package(sbom, image.digest)
+            package = checksum_index.get(without_sha_header(image.digest))
             if package is None:
                 logger.warning("Could not find SPDX package for %s.", image.digest)
                 continue
 
-            original_purl = cls._find_purl_in_refs(package, image.digest)
-            if original_purl is None:
+            purl_and_arch = cls._find_purl_and_arch_in_refs(package, image.digest)
+            if purl_and_arch is None:
                 logger.warning(
                     "Could not find OCI PURL for %s in package %s for index %s.",
                     image.digest,
@@ -233,11 +272,11 @@ class SPDXVersion2(SBOMHandler):  # pylint: disable=too-few-public-methods
                 )
                 continue
 
-            arch = get_purl_arch(original_purl)
+            _, arch = purl_and_arch
             package.update_external_refs(
                 image.digest,
-                component.release_repository,
-                component.tags,
+                release_repository,
+                tags,
                 arch=arch,
             )
 
@@ -248,7 +287,15 @@ class SPDXVersion2(SBOMHandler):  # pylint: disable=too-few-public-methods
         """
         sbom["name"] = make_reference(component.release_repository, image.digest)
 
-        image_package = cls._find_image_package(sbom, image.digest)
+        if not component.tags:
+            logger.warning(
+                "Component %s has no tags, skipping purl updates for image %s.",
+                component.name,
+                image.digest,
+            )
+            return
+
+        image_package = cls._build_checksum_index(sbom).get(without_sha_header(image.digest))
         if not image_package:
             raise SBOMError(f"Could not find SPDX package in SBOM for image {image.digest}")
 
@@ -261,7 +308,7 @@ class SPDXVersion2(SBOMHandler):  # pylint: disable=too-few-public-methods
     def update_sbom(
         self, component: Component, image: Union[IndexImage, Image], sbom: dict
     ) -> None:
-        if isinstance(image, IndexImage):
-            SPDXVersion2._update_index_image_sbom(component, image, sbom)
-        elif isinstance(image, Image):
-            SPDXVersion2._update_image_sbom(component, image, sbom)
+        if image.kind == "index":
+            SPDXVersion2._update_index_image_sbom(component, image, sbom)  # type: ignore
+        else:
+            SPDXVersion2._update_image_sbom(component, image, sbom)  # type: ignore
@@ -3,24 +3,34 @@ This library contains utility functions for SBOM generation and enrichment.
 """
 
 from contextlib import contextmanager
-import json
-from typing import Optional, Any, Protocol, Union, Generator
+import functools
+from typing import ClassVar, Optional, Any, Protocol, Union, Generator
 from pathlib import Path
 from dataclasses import dataclass
 import re
 import asyncio
 import tempfile
 import os
+import urllib.parse
 
 
+import msgspec
+import orjson
 from packageurl import PackageURL
-import pydantic as pdc
 
 from sbom.log import get_sbom_logger
 
-
 logger = get_sbom_logger()
 
+# Maximum number of concurrent manifest fetches in make_snapshot. Unbounded
+# fan-out spawns one subprocess per component at once, which thrashes rather
+# than speeds up large snapshots.
+FETCH_CONCURRENCY = int(os.environ.get("SBOM_FETCH_CONCURRENCY", "16"))
+
+# Digest references have the form <repository>@sha256:<64 hex chars>.
+# References with a registry port are NOT supported.
+_DIGEST_REF_RE = re.compile(r"[^:]+@sha256:[0-9a-f]{64}")
+
 
 @dataclass
 class Image:
@@ -28,6 +38,10 @@ class Image:
     Object representing a single image in some repository.
     """
 
+    __slots__ = ("digest",)
+
+    kind: ClassVar[str] = "image"
+
     digest: str
 
 
@@ -38,6 +52,10 @@ class IndexImage:
     references to child images.
     """
 
+    __slots__ = ("digest", "children")
+
+    kind: ClassVar[str] = "index"
+
     digest: str
     children: list[Image]
 
@@ -48,6 +66,8 @@ class Component:
     Internal representation of a Component for SBOM generation purposes.
     """
 
+    __slots__ = ("name", "release_repository", "image", "tags", "repository")
+
     name: str
     release_repository: str
     image: Union[Image, IndexImage]
@@ -61,6 +81,8 @@ class Snapshot:
     Internal representation of a Snapshot for SBOM generation purposes.
     """
 
+    __slots__ = ("components",)
+
     components: list[Component]
 
 
@@ -73,32 +95,31 @@ class SBOMError(Exception):
         super().__init__(*args, **kwargs)
 
 
-class ComponentModel(pdc.BaseModel):
+class ComponentModel(msgspec.Struct):
     """
     Model representing a component from the Snapshot.
     """
 
     name: str
-    image_digest: str = pdc.Field(alias="containerImage")
-    rh_registry_repo: str = pdc.Field(alias="rh-registry-repo")
+    image_digest: str = msgspec.field(name="containerImage")
+    rh_registry_repo: str = msgspec.field(name="rh-registry-repo")
     tags: list[str]
     repository: str
 
-    @pdc.field_validator("image_digest", mode="after")
-    @classmethod
-    def is_valid_digest_reference(cls, value: str) -> str:
+    def __post_init__(self) -> None:
         """
-        Validates that the digest reference is in the correct format. Does NOT
-        support references with a registry port.
+        Validates that the digest reference is in the correct format and
+        strips the repository from it. Does NOT support references with a
+        registry port.
         """
-        if not re.match(r"^[^:]+@sha256:[0-9a-f]+$", value):
-            raise ValueError(f"{value} is not a valid digest reference.")
+        if not _DIGEST_REF_RE.fullmatch(self.image_digest):
+            raise ValueError(f"{self.image_digest} is not a valid digest reference.")
 
         # strip repository
-        return value.split("@")[1]
+        self.image_digest = self.image_digest.partition("@")[2]
 
 
-class SnapshotModel(pdc.BaseModel):
+class SnapshotModel(msgspec.Struct):
     """
     Model representing a Snapshot spec file after the apply-mapping task.
     Only the parts relevant to component sboms are parsed.
@@ -150,8 +171,13 @@ async def construct_image(repository: str, image_digest: str) -> Union[Image, In
         "application/vnd.docker.distribution.manifest.list.v2+json",
     }:
         children = []
+        seen_digests = set()
         for submanifest in manifest["manifests"]:
             child_digest = submanifest["digest"]
+            if child_digest in seen_digests:
+                continue
+
+            seen_digests.add(child_digest)
             children.append(Image(child_digest))
 
         return IndexImage(digest=image_digest, children=children)
@@ -188,35 +214,72 @@ async def make_snapshot(snapshot_spec: Path) -> Snapshot:
     Args:
         snapshot_spec (Path): Path to a snapshot spec JSON file
     """
-    with open(snapshot_spec, mode="r", encoding="utf-8") as snapshot_file:
-        snapshot_model = SnapshotModel.model_validate_json(snapshot_file.read())
-
-    component_tasks = []
-    for component_model in snapshot_model.components:
-        name = component_model.name
-        release_repository = component_model.rh_registry_repo
-        image_digest = component_model.image_digest
-        tags = component_model.tags
-
-        component_tasks.append(
-            make_component(
-                name, release_repository, image_digest, tags, component_model.repository
+    # Read raw bytes; msgspec decodes UTF-8 itself, so this skips building an
+    # intermediate str copy of the whole spec.
+    with open(snapshot_spec, mode="rb") as snapshot_file:
+        snapshot_model = msgspec.json.decode(snapshot_file.read(), type=SnapshotModel)
+
+    semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+    async def bounded_make_component(component_model: ComponentModel) -> Component:
+        async with semaphore:
+            return await make_component(
+                component_model.name,
+                component_model.rh_registry_repo,
+                component_model.image_digest,
+                component_model.tags,
+                component_model.repository,
             )
-        )
 
-    components = await asyncio.gather(*component_tasks)
+    component_tasks = [
+        asyncio.ensure_future(bounded_make_component(component_model))
+        for component_model in snapshot_model.components
+    ]
+
+    try:
+        components = await asyncio.gather(*component_tasks)
+    except BaseException:
+        # Fail fast: plain gather leaves sibling tasks (and their
+        # subprocesses) running after the first failure.
+        for task in component_tasks:
+            task.cancel()
+        raise
 
     return Snapshot(components=components)
 
 
+@functools.lru_cache(maxsize=4096)
 def construct_purl(
     repository: str, digest: str, arch: Optional[str] = None, tag: Optional[str] = None
 ) -> str:
     """
     Construct an OCI PackageURL string from image data.
-    """
-    purl = construct_purl_object(repository, digest, arch, tag)
-    return purl.to_string()
+
+    The string is formatted directly instead of round-tripping through a
+    PackageURL object, which is noticeably cheaper on the per-tag hot path.
+    The output is identical to construct_purl_object(...).to_string().
+
+    The result is a pure function of the arguments, so it is cached to avoid
+    rebuilding identical purls for repeated (repository, digest, arch, tag)
+    combinations across components.
+    """
+    repo_name = repository.rsplit("/", 1)[-1].lower()
+
+    # PackageURL.to_string emits qualifiers sorted by key, drops qualifiers
+    # with empty values and keeps "/" and ":" unencoded in the remaining
+    # ones. The fixed keys arch < repository_url < tag are appended in
+    # alphabetical order, so no sort is needed.
+    qualifiers = []
+    if arch:
+        qualifiers.append(("arch", arch))
+    qualifiers.append(("repository_url", repository))
+    if tag:
+        qualifiers.append(("tag", tag))
+
+    query = "&".join(
+        f"{key}={urllib.parse.quote(value, safe='/:')}" for key, value in qualifiers
+    )
+    return f"pkg:oci/{urllib.parse.quote(repo_name)}@{digest}?{query}"
 
 
 def construct_purl_object(
@@ -278,19 +341,160 @@ async def run_async_subprocess(
     return code, stdout, stderr
 
 
+async def run_async_subprocess_to_file(
+    cmd: list[str],
+    output_path: Path,
+    env: Optional[dict[str, str]] = None,
+    retry_times: int = 0,
+) -> tuple[int, bytes]:
+    """
+    Run command in subprocess asynchronously, streaming its stdout directly to
+    a file. Avoids buffering the whole output in memory. The output is written
+    to a temporary sibling and only renamed to <output_path> on success, so a
+    failed run leaves no partial file behind.
+
+    Args:
+        cmd (list[str]): command to run in subprocess.
+        output_path (Path): file the subprocess stdout is written to.
+        env (dict[str, str] | None): environ dict
+        retry_times (int): number of retries if the process ends with non-zero return code
+    """
+    if retry_times < 0:
+        raise ValueError("Retry count cannot be negative.")
+
+    cmd_env = dict(os.environ)
+    if env:
+        cmd_env.update(env)
+
+    part_path = output_path.with_name(output_path.name + ".part")
+    try:
+        for _ in range(1 + retry_times):
+            fd = os.open(part_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *cmd,
+                    stdout=fd,
+                    stderr=asyncio.subprocess.PIPE,
+                    env=cmd_env,
+                )
+            finally:
+                os.close(fd)
+
+            _, stderr = await proc.communicate()
+            # can't be None after proc.communicate is awaited
+            assert proc.returncode is not None
+            code = proc.returncode
+            if code == 0:
+                os.replace(part_path, output_path)
+                return code, stderr
+
+        # guaranteed to be bound, the loop runs at least once
+        return code, stderr
+    finally:
+        try:
+            os.unlink(part_path)
+        except OSError:
+            pass
+
+
+# Single-flight cache of manifest fetches. Concurrent callers asking for the
+# same (repository, digest) pair share one fetch, and completed results are
+# reused for the lifetime of the process.
+_manifest_tasks: dict[tuple[str, str], "asyncio.Task[dict[str, Any]]"] = {}
+
+# Cap on concurrently running oras subprocesses, independent of how many
+# manifest fetches are scheduled upstream. The semaphore is created lazily so
+# it binds to the running event loop.
+_MANIFEST_FETCH_LIMIT = min(32, (os.cpu_count() or 1) * 4)
+_manifest_fetch_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_manifest_fetch_semaphore() -> asyncio.Semaphore:
+    global _manifest_fetch_semaphore
+    if _manifest_fetch_semaphore is None:
+        _manifest_fetch_semaphore = asyncio.Semaphore(_MANIFEST_FETCH_LIMIT)
+
+    return _manifest_fetch_semaphore
+
+
 async def get_image_manifest(repository: str, image_digest: str) -> dict[str, Any]:
     """
     Gets a dictionary containing the data from a manifest for an image in a
     repository.
 
+    Fetches for the same image are coalesced and cached, so the returned
+    dictionary may be shared between callers and must not be mutated.
+
     Args:
         repository (str): image repository URL
         image_digest (str): an image digest in the form sha256:<sha>
     """
+    key = (repository, image_digest)
+    task = _manifest_tasks.get(key)
+    if task is None:
+        task = asyncio.create_task(_fetch_image_manifest(repository, image_digest))
+        _manifest_tasks[key] = task
+
+    try:
+        return await task
+    except BaseException:
+        # Failed fetches are evicted so that later callers can retry.
+        if _manifest_tasks.get(key) is task:
+            del _manifest_tasks[key]
+        raise
+
+
+def _manifest_cache_dir() -> Path:
+    """
+    Directory for the on-disk manifest cache. Manifests are content-addressed
+    by digest and therefore never expire.
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return Path(cache_home).joinpath("sbomlib", "manifests")
+
+
+def _cache_manifest(cache_path: Path, manifest_bytes: bytes) -> None:
+    """
+    Atomically store raw manifest bytes in the on-disk cache. Failures are
+    logged and ignored; the cache is purely an optimization.
+    """
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            mode="wb", dir=cache_path.parent, delete=False
+        ) as tmp_fp:
+            tmp_fp.write(manifest_bytes)
+
+        os.replace(tmp_fp.name, cache_path)
+    except OSError as err:
+        logger.debug("Could not cache manifest to %s: %s", cache_path, err)
+
+
+async def _fetch_image_manifest(repository: str, image_digest: str) -> dict[str, Any]:
+    """
+    Fetch a manifest from a registry, bypassing the task cache in
+    get_image_manifest. Digest-pinned manifests are immutable, so results are
+    also kept in an on-disk cache reused across invocations.
+    """
+    cache_path = _manifest_cache_dir().joinpath(f"{without_sha_header(image_digest)}.json")
+    try:
+        return orjson.loads(cache_path.read_bytes())  # type: ignore
+    except OSError:
+        pass
+    except ValueError:
+        # A corrupt or truncated cache entry would otherwise fail every run
+        # until removed by hand; drop it and refetch.
+        logger.warning("Removing corrupt cached manifest at %s", cache_path)
+        try:
+            cache_path.unlink()
+        except OSError:
+            pass
+
     reference = make_reference(repository, image_digest)
     logger.info("Fetching manifest for %s", reference)
 
-    with make_oci_auth_file(reference) as authfile:
+    authfile = cached_oci_auth_file(reference)
+    async with _get_manifest_fetch_semaphore():
         code, stdout, stderr = await run_async_subprocess(
             [
                 "oras",
@@ -305,7 +509,8 @@ async def get_image_manifest(repository: str, image_digest: str) -> dict[str, An
     if code != 0:
         raise SBOMError(f"Could not get manifest of {reference}: {stderr.decode()}")
 
-    return json.loads(stdout)  # type: ignore
+    _cache_manifest(cache_path, stdout)
+    return orjson.loads(stdout)  # type: ignore
 
 
 def make_reference(repository: str, image_digest: str) -> str:
@@ -324,28 +529,55 @@ def make_reference(repository: str, image_digest: str) -> str:
     return f"{repository}@{image_digest}"
 
 
-@contextmanager
-def make_oci_auth_file(
-    reference: str, authfile: Optional[Path] = None
-) -> Generator[str, Any, None]:
+# Default docker config location, expanded once at import time.
+_DOCKER_CONFIG_PATH = Path(os.path.expanduser("~/.docker/config.json"))
+
+
+@functools.lru_cache(maxsize=8)
+def _load_docker_config(authfile: str) -> dict[str, Any]:
     """
-    Gets path to a temporary file containing the docker config JSON for
-    <reference>.  Deletes the file after the with statement. If no path to the
-    docker config is provided, tries using ~/.docker/config.json . Ports in the
-    registry are NOT supported.
+    Load and parse a docker config JSON file, caching the result so repeated
+    auth lookups do not re-read the file per image. The returned dict is
+    shared between callers and must not be mutated.
+    """
+    with open(authfile, mode="rb") as fp:
+        return orjson.loads(fp.read())  # type: ignore
 
-    Args:
-        reference (str): Reference to an image in the form registry/repo@sha256-deadbeef
-        authfile (Path | None): Existing docker config.json
 
-    Example:
-        >>> with make_oci_auth_file(ref) as auth_path:
-                perform_work_in_oci()
+@functools.lru_cache(maxsize=8)
+def _sorted_auth_keys(authfile: str) -> list[str]:
     """
-    if authfile is None:
-        authfile = Path(os.path.expanduser("~/.docker/config.json"))
+    Keys of the auths field of a docker config, sorted longest first so that
+    the first prefix match is the most specific one.
+    """
+    auths_field = _load_docker_config(authfile).get("auths", {})
+    return sorted(auths_field.keys(), key=len, reverse=True)
 
-    logger.debug("Creating OCI auth file for %s from %s.", reference, authfile)
+
+@functools.lru_cache(maxsize=256)
+def _resolve_auth(authfile: str, ref: str) -> Optional[dict[str, Any]]:
+    """
+    Find the most specific auth entry matching a repository path on a path
+    segment boundary. Results are memoized per (config, ref), and the
+    returned entry is shared and must not be mutated.
+    """
+    auths_field = _load_docker_config(authfile).get("auths", {})
+
+    for key in _sorted_auth_keys(authfile):
+        if ref == key or ref.startswith(key + "/"):
+            return auths_field[key]  # type: ignore
+
+    return None
+
+
+def _resolve_auth_content(reference: str, authfile: Optional[Path] = None) -> bytes:
+    """
+    Resolve the docker config JSON content narrowed down to the registry of
+    <reference>. If no path to the docker config is provided, tries using
+    ~/.docker/config.json . Ports in the registry are NOT supported.
+    """
+    if authfile is None:
+        authfile = _DOCKER_CONFIG_PATH
 
     if not authfile.is_file():
         raise ValueError(f"No docker config file at {authfile}")
@@ -361,47 +593,83 @@ def make_oci_auth_file(
     # Registry is up to the first slash
     registry = ref.split("/", 1)[0]
 
-    with open(authfile, mode="r", encoding="utf-8") as fp:
-        config = json.load(fp)
+    token = _resolve_auth(str(authfile), ref)
+    if token is None:
+        logger.warning("No authentication for %s found!", reference)
+        return orjson.dumps({"auths": {}})
 
-    auths_field = config.get("auths", {})
-    logger.debug(
-        "OCI auth in %s available for repositories: %s", authfile, list(auths_field.keys())
-    )
+    return orjson.dumps({"auths": {registry: token}})
 
-    current_ref = ref
+
+@contextmanager
+def make_oci_auth_file(
+    reference: str, authfile: Optional[Path] = None
+) -> Generator[str, Any, None]:
+    """
+    Gets path to a temporary file containing the docker config JSON for
+    <reference>.  Deletes the file after the with statement. If no path to the
+    docker config is provided, tries using ~/.docker/config.json . Ports in the
+    registry are NOT supported.
+
+    Args:
+        reference (str): Reference to an image in the form registry/repo@sha256-deadbeef
+        authfile (Path | None): Existing docker config.json
+
+    Example:
+        >>> with make_oci_auth_file(ref) as auth_path:
+                perform_work_in_oci()
+    """
+    logger.debug("Creating OCI auth file for %s from %s.", reference, authfile)
+    content = _resolve_auth_content(reference, authfile)
 
     tempdir = None
-    config_fp = None
     try:
         tempdir = tempfile.TemporaryDirectory()
         config_path = Path(tempdir.name).joinpath("config.json")
-        config_fp = open(config_path, "w")
-
-        while True:
-            token = auths_field.get(current_ref)
-            if token is not None:
-                json.dump({"auths": {registry: token}}, config_fp)
-                config_fp.close()
-                yield str(config_path)
-                return
+        config_path.write_bytes(content)
 
-            if "/" not in current_ref:
-                break
-            current_ref = current_ref.rsplit("/", 1)[0]
-
-        logger.warning("No authentication for %s found!", reference)
-        json.dump({"auths": {}}, config_fp)
-        config_fp.close()
         yield str(config_path)
     finally:
-        if config_fp is not None:
-            config_fp.close()
-
         if tempdir is not None:
             tempdir.cleanup()
 
 
+# Long-lived auth files reused across fetches, keyed by config content. Each
+# file sits in its own subdirectory so callers can also point DOCKER_CONFIG at
+# its parent. The backing directory lives until interpreter exit.
+_session_auth_files: dict[bytes, str] = {}
+_session_auth_tmpdir: Optional[tempfile.TemporaryDirectory] = None
+
+
+def cached_oci_auth_file(reference: str, authfile: Optional[Path] = None) -> str:
+    """
+    Gets path to a long-lived file containing the docker config JSON for
+    <reference>. Unlike make_oci_auth_file, the file is created once per
+    distinct auth content and reused for the lifetime of the process,
+    avoiding a tempfile write per fetch. Files are backed by /dev/shm when
+    available, so reuse costs no disk I/O.
+    """
+    global _session_auth_tmpdir
+
+    content = _resolve_auth_content(reference, authfile)
+    path = _session_auth_files.get(content)
+    if path is None:
+        if _session_auth_tmpdir is None:
+            shm = "/dev/shm"
+            _session_auth_tmpdir = tempfile.TemporaryDirectory(
+                prefix="sbom-oci-auth-", dir=shm if os.path.isdir(shm) else None
+            )
+
+        subdir = tempfile.mkdtemp(dir=_session_auth_tmpdir.name)
+        path = os.path.join(subdir, "config.json")
+        with open(path, "wb") as fp:
+            fp.write(content)
+
+        _session_auth_files[content] = path
+
+    return path
+
+
 def without_sha_header(digest: str) -> str:
     """
     Returns a digest without the "sha256:" header.
@@ -409,23 +677,29 @@ def without_sha_header(digest: str) -> str:
     return digest.removeprefix("sha256:")
 
 
+# Fast-path patterns for extracting single fields from OCI purls without the
+# full (and much slower) PackageURL.from_string parse.
+_PURL_VERSION_RE = re.compile(r"@([^?#]+)")
+_PURL_ARCH_RE = re.compile(r"[?&]arch=([^&#]+)")
+
+
 def get_purl_arch(purl_str: str) -> Optional[str]:
     """
     Get the arch qualifier from a PackageURL.
     """
-    purl = PackageURL.from_string(purl_str)
-    if isinstance(purl.qualifiers, dict):
-        return purl.qualifiers.get("arch")
+    match = _PURL_ARCH_RE.search(purl_str)
+    if match is None:
+        return None
 
-    logger.warning("Parsed qualifiers from purl %s are not a dictionary.", purl_str)
-    return None
+    return urllib.parse.unquote(match.group(1))
 
 
 def get_purl_digest(purl_str: str) -> str:
     """
     Get the image digest from a PackageURL.
     """
-    purl = PackageURL.from_string(purl_str)
-    if purl.version is None:
+    match = _PURL_VERSION_RE.search(purl_str)
+    if match is None:
         raise SBOMError(f"SBOM contains invalid OCI Purl: {purl_str}")
-    return purl.version
+
+    return urllib.parse.unquote(match.group(1))
@@ -60,14 +60,14 @@ async def test_make_snapshot(index_manifest: dict[str, str]) -> None:
             "components": [
                 {
                     "name": "comp-1",
-                    "containerImage": "quay.io/repo1@sha256:deadbeef",
+                    "containerImage": f"quay.io/repo1@sha256:{'deadbeef' * 8}",
                     "rh-registry-repo": "registry.redhat.io/repo1",
                     "tags": ["1.0"],
                     "repository": "quay.io/repo1",
                 },
                 {
                     "name": "comp-2",
-                    "containerImage": "quay.io/repo2@sha256:ffffffff",
+                    "containerImage": f"quay.io/repo2@sha256:{'f' * 64}",
                     "rh-registry-repo": "registry.redhat.io/repo2",
                     "tags": ["2.0", "latest"],
                     "repository": "quay.io/repo2",
@@ -81,14 +81,16 @@ async def test_make_snapshot(index_manifest: dict[str, str]) -> None:
             Component(
                 name="comp-1",
                 release_repository="registry.redhat.io/repo1",
-                image=IndexImage("sha256:deadbeef", children=[Image("sha256:aaaaffff")]),
+                image=IndexImage(
+                    f"sha256:{'deadbeef' * 8}", children=[Image("sha256:aaaaffff")]
+                ),
                 tags=["1.0"],
                 repository="quay.io/repo1",
             ),
             Component(
                 name="comp-2",
                 release_repository="registry.redhat.io/repo2",
-                image=IndexImage("sha256:ffffffff", children=[Image("sha256:bbbbffff")]),
+                image=IndexImage(f"sha256:{'f' * 64}", children=[Image("sha256:bbbbffff")]),
                 tags=["2.0", "latest"],
                 repository="quay.io/repo2",
             ),
@@ -116,6 +118,35 @@ async def test_make_snapshot(index_manifest: dict[str, str]) -> None:
             assert snapshot == expected_snapshot
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ["container_image"],
+    [
+        pytest.param("quay.io/repo@sha256:deadbeef", id="truncated-digest"),
+        pytest.param(f"quay.io/repo@sha512:{'a' * 64}", id="wrong-algorithm"),
+        pytest.param(f"quay.io/repo:{'a' * 64}", id="missing-at"),
+    ],
+)
+async def test_make_snapshot_invalid_digest(container_image: str) -> None:
+    snapshot_raw = json.dumps(
+        {
+            "components": [
+                {
+                    "name": "comp-1",
+                    "containerImage": container_image,
+                    "rh-registry-repo": "registry.redhat.io/repo1",
+                    "tags": ["1.0"],
+                    "repository": "quay.io/repo1",
+                }
+            ]
+        }
+    )
+
+    with patch("builtins.open", mock_open(read_data=snapshot_raw)):
+        with pytest.raises(ValueError, match="is not a valid digest reference"):
+            await sbomlib.make_snapshot(Path(""))
+
+
 @pytest.mark.parametrize(
     ["repository", "digest", "arch", "tag", "expected"],
     [
@@ -147,3 +178,24 @@ def test_construct_purl(
     repository: str, digest: str, arch: Optional[str], tag: Optional[str], expected: str
 ) -> None:
     assert construct_purl(repository, digest, arch, tag) == expected
+
+
+@pytest.mark.parametrize(
+    ["repository", "digest", "arch", "tag"],
+    [
+        pytest.param("registry.redhat.io/test", "sha256:deadbeef", "amd64", "1.0"),
+        pytest.param("registry.redhat.io/org/test", "sha256:deadbeef", None, None),
+        pytest.param("registry.redhat.io/org/Test_Repo.x", "sha256:deadbeef", "s390x", None),
+        pytest.param("registry.redhat.io/test", "sha256:deadbeef", None, "v1.2.3+build"),
+        pytest.param("registry.redhat.io/test", "sha256:deadbeef", "", "", id="empty-strings"),
+    ],
+)
+def test_construct_purl_matches_packageurl(
+    repository: str, digest: str, arch: Optional[str], tag: Optional[str]
+) -> None:
+    """
+    Verify that the direct string formatting in construct_purl stays
+    byte-identical to PackageURL's own serialization.
+    """
+    expected = sbomlib.construct_purl_object(repository, digest, arch, tag).to_string()
+    assert construct_purl(repository, digest, arch, tag) == expected
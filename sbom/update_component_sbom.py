@@ -10,11 +10,11 @@ $ update_component_sbom --snapshot-path snapshot_spec.json --output-path sboms/
 
 import argparse
 import asyncio
-import json
+import os
 from typing import Union
 from pathlib import Path
 
-import aiofiles
+import orjson
 
 from sbom import sbomlib
 from sbom.handlers import CycloneDXVersion1, SPDXVersion2
@@ -27,51 +27,73 @@ from sbom.sbomlib import (
     IndexImage,
 )
 
-
 logger = get_sbom_logger()
 
-CONCURRENCY_LIMIT = 8
+CONCURRENCY_LIMIT = int(os.environ.get("SBOM_UPDATE_CONCURRENCY", "8"))
 
 
 async def fetch_sbom(destination_dir: Path, reference: str) -> Path:
     """
     Download an SBOM for an image reference to a destination directory.
     """
-    with sbomlib.make_oci_auth_file(reference) as authfile:
-        code, stdout, stderr = await sbomlib.run_async_subprocess(
-            ["cosign", "download", "sbom", reference],
-            env={"DOCKER_CONFIG": str(Path(authfile).parent)},
-            retry_times=3,
-        )
+    digest = reference.split("@", 1)[1]
+    path = destination_dir.joinpath(digest)
+
+    authfile = sbomlib.cached_oci_auth_file(reference)
+    code, stderr = await sbomlib.run_async_subprocess_to_file(
+        ["cosign", "download", "sbom", reference],
+        output_path=path,
+        env={"DOCKER_CONFIG": str(Path(authfile).parent)},
+        retry_times=3,
+    )
 
     if code != 0:
         raise SBOMError(f"Failed to fetch SBOM {reference}: {stderr.decode()}")
 
-    digest = reference.split("@", 1)[1]
-    path = destination_dir.joinpath(digest)
-    async with aiofiles.open(path, "wb") as file:
-        await file.write(stdout)
-
     return path
 
 
+# In-flight and completed SBOM downloads keyed by image reference, so that
+# components sharing an image digest download the blob only once.
+_sbom_tasks: dict[str, "asyncio.Task[tuple[bytes, Path]]"] = {}
+
+
+async def _fetch_sbom_bytes(reference: str, destination: Path) -> tuple[bytes, Path]:
+    path = await fetch_sbom(destination, reference)
+    raw_sbom = await asyncio.to_thread(path.read_bytes)
+    return raw_sbom, path
+
+
 async def load_sbom(reference: str, destination: Path) -> tuple[dict, Path]:
     """
     Download the sbom for the image reference, save it to a directory and parse
     it into a dictionary.
+
+    Concurrent and repeated calls for the same reference share a single
+    download. The raw bytes are cached and each caller parses its own copy off
+    the event loop, so callers can mutate the resulting dicts independently.
     """
-    path = await fetch_sbom(destination, reference)
-    async with aiofiles.open(path, "r") as sbom_raw:
-        sbom = json.loads(await sbom_raw.read())
-        return sbom, path
+    task = _sbom_tasks.get(reference)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_sbom_bytes(reference, destination))
+        _sbom_tasks[reference] = task
+
+    try:
+        raw_sbom, path = await task
+    except BaseException:
+        # Evict failed downloads so later calls can retry.
+        if _sbom_tasks.get(reference) is task:
+            del _sbom_tasks[reference]
+        raise
+
+    return await asyncio.to_thread(orjson.loads, raw_sbom), path
 
 
 async def write_sbom(sbom: dict, path: Path) -> None:
     """
     Write an SBOM dictionary to a file.
     """
-    async with aiofiles.open(path, "w") as fp:
-        await fp.write(json.dumps(sbom))
+    await asyncio.to_thread(path.write_bytes, orjson.dumps(sbom))
 
 
 def update_sbom_in_situ(
@@ -125,7 +147,9 @@ async def update_sbom(
         try:
             sbom, sbom_path = await load_sbom(reference, destination)
 
-            if not update_sbom_in_situ(component, image, sbom):
+            # The update itself is pure CPU work; run it in a thread so it
+            # does not stall concurrent fetches on the event loop.
+            if not await asyncio.to_thread(update_sbom_in_situ, component, image, sbom):
                 raise SBOMError(f"Unsupported SBOM format for image {reference}.")
 
             await write_sbom(sbom, sbom_path)
@@ -135,6 +159,21 @@ async def update_sbom(
             raise
 
 
+async def _gather_fail_fast(coros) -> None:
+    """
+    Await coroutines concurrently, cancelling the remaining ones as soon as
+    any of them fails. One broken SBOM dooms the whole release, so there is
+    no point finishing the other downloads.
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
 async def update_component_sboms(
     component: Component, destination: Path, semaphore: asyncio.Semaphore
 ) -> None:
@@ -158,7 +197,7 @@ async def update_component_sboms(
         for child in index.children:
             update_tasks.append(update_sbom(component, child, destination, semaphore))
 
-        await asyncio.gather(*update_tasks)
+        await _gather_fail_fast(update_tasks)
         return
 
     # Single arch image
@@ -175,11 +214,9 @@ async def update_sboms(snapshot: Snapshot, destination: Path) -> None:
         destination (Path): Path to the directory to save the SBOMs to.
     """
     semaphore = asyncio.Semaphore(CONCURRENCY_LIMIT)
-    await asyncio.gather(
-        *[
-            update_component_sboms(component, destination, semaphore)
-            for component in snapshot.components
-        ]
+    await _gather_fail_fast(
+        update_component_sboms(component, destination, semaphore)
+        for component in snapshot.components
     )
 
 